@@ -3,200 +3,318 @@ MCP Server for code search, read, and PR analysis.
 """
 
 import asyncio
-from typing import Any
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable
 
+import jsonschema
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
 from mcp.types import Tool, TextContent
 
+from .tools.search import search_files
+from .tools.read import read_file
+from .tools.github import (
+    close_client,
+    get_pr_diff,
+    search_github_files,
+    read_github_file,
+    read_github_files,
+    grep_github_repo,
+)
+
+__all__ = [
+    "app",
+    "list_tools",
+    "call_tool",
+    "main",
+]
+
+
+@asynccontextmanager
+async def lifespan(server: Server) -> AsyncIterator[dict]:
+    """Release shared resources when the server shuts down."""
+    try:
+        yield {}
+    finally:
+        await close_client()
+
+
 # Initialize MCP server
-app = Server("mcp-server")
+app = Server("mcp-server", lifespan=lifespan)
 
+# GitHub tools that can be fanned out concurrently through batch_github
+GITHUB_TOOLS = [
+    "get_pr_diff",
+    "search_github_files",
+    "read_github_file",
+    "read_github_files",
+    "grep_github_repo",
+]
 
-@app.list_tools()
-async def list_tools() -> list[Tool]:
-    """List available MCP tools."""
-    return [
-        Tool(
-            name="search_files",
-            description="Search for files by name pattern (glob) or content (grep) in local codebase",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "query": {
-                        "type": "string",
-                        "description": "Search query (file pattern for glob, regex for grep)",
-                    },
-                    "search_type": {
-                        "type": "string",
-                        "enum": ["glob", "grep"],
-                        "description": "Type of search to perform",
-                    },
-                    "path": {
-                        "type": "string",
-                        "description": "Root path to search within (defaults to current directory)",
-                    },
+# Tool handlers by name, each taking the call arguments and returning text
+_DISPATCH: dict[str, Callable[[Any], Awaitable[str]]] = {
+    "search_files": lambda arguments: search_files(
+        query=arguments["query"],
+        search_type=arguments["search_type"],
+        path=arguments.get("path", "."),
+    ),
+    "read_file": lambda arguments: read_file(
+        file_path=arguments["file_path"],
+    ),
+    "get_pr_diff": lambda arguments: get_pr_diff(
+        repo=arguments["repo"],
+        pr_number=arguments["pr_number"],
+    ),
+    "search_github_files": lambda arguments: search_github_files(
+        repo=arguments["repo"],
+        query=arguments["query"],
+        path=arguments.get("path"),
+    ),
+    "read_github_file": lambda arguments: read_github_file(
+        repo=arguments["repo"],
+        file_path=arguments["file_path"],
+        branch=arguments.get("branch", "main"),
+    ),
+    "read_github_files": lambda arguments: read_github_files(
+        repo=arguments["repo"],
+        file_paths=arguments["file_paths"],
+        branch=arguments.get("branch", "main"),
+    ),
+    "grep_github_repo": lambda arguments: grep_github_repo(
+        repo=arguments["repo"],
+        query=arguments["query"],
+        path=arguments.get("path"),
+    ),
+}
+
+# Schema of the "repo" argument shared by the GitHub tools
+_REPO_PROPERTY = {
+    "type": "string",
+    "description": "Repository in format 'owner/repo'",
+}
+
+# Tool definitions, built once and returned on every list_tools request
+_TOOLS: tuple[Tool, ...] = (
+    Tool(
+        name="search_files",
+        description="Search for files by name pattern (glob) or content (grep) in local codebase",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": "Search query (file pattern for glob, regex for grep)",
+                },
+                "search_type": {
+                    "type": "string",
+                    "enum": ["glob", "grep"],
+                    "description": "Type of search to perform",
+                },
+                "path": {
+                    "type": "string",
+                    "description": "Root path to search within (defaults to current directory)",
                 },
-                "required": ["query", "search_type"],
             },
-        ),
-        Tool(
-            name="read_file",
-            description="Read the full contents of a file from the local filesystem",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "file_path": {
-                        "type": "string",
-                        "description": "Absolute or relative path to the file to read",
-                    },
+            "required": ["query", "search_type"],
+        },
+    ),
+    Tool(
+        name="read_file",
+        description="Read the full contents of a file from the local filesystem",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "file_path": {
+                    "type": "string",
+                    "description": "Absolute or relative path to the file to read",
                 },
-                "required": ["file_path"],
             },
-        ),
-        Tool(
-            name="get_pr_diff",
-            description="Fetch and analyze Pull Request changes from GitHub",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "repo": {
-                        "type": "string",
-                        "description": "Repository in format 'owner/repo'",
-                    },
-                    "pr_number": {
-                        "type": "integer",
-                        "description": "Pull request number",
-                    },
+            "required": ["file_path"],
+        },
+    ),
+    Tool(
+        name="get_pr_diff",
+        description="Fetch and analyze Pull Request changes from GitHub",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "repo": _REPO_PROPERTY,
+                "pr_number": {
+                    "type": "integer",
+                    "description": "Pull request number",
                 },
-                "required": ["repo", "pr_number"],
             },
-        ),
-        Tool(
-            name="search_github_files",
-            description="Search for files in a GitHub repository by name or path pattern",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "repo": {
-                        "type": "string",
-                        "description": "Repository in format 'owner/repo'",
-                    },
-                    "query": {
-                        "type": "string",
-                        "description": "Filename or path pattern to search for",
-                    },
-                    "path": {
-                        "type": "string",
-                        "description": "Optional path prefix to search within (e.g., 'src/')",
-                    },
+            "required": ["repo", "pr_number"],
+        },
+    ),
+    Tool(
+        name="search_github_files",
+        description="Search for files in a GitHub repository by name or path pattern",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "repo": _REPO_PROPERTY,
+                "query": {
+                    "type": "string",
+                    "description": "Filename or path pattern to search for",
+                },
+                "path": {
+                    "type": "string",
+                    "description": "Optional path prefix to search within (e.g., 'src/')",
                 },
-                "required": ["repo", "query"],
             },
-        ),
-        Tool(
-            name="read_github_file",
-            description="Read the contents of a file from a GitHub repository",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "repo": {
-                        "type": "string",
-                        "description": "Repository in format 'owner/repo'",
-                    },
-                    "file_path": {
-                        "type": "string",
-                        "description": "Path to the file in the repository",
-                    },
-                    "branch": {
-                        "type": "string",
-                        "description": "Branch name (defaults to 'main')",
-                    },
+            "required": ["repo", "query"],
+        },
+    ),
+    Tool(
+        name="read_github_file",
+        description="Read the contents of a file from a GitHub repository",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "repo": _REPO_PROPERTY,
+                "file_path": {
+                    "type": "string",
+                    "description": "Path to the file in the repository",
+                },
+                "branch": {
+                    "type": "string",
+                    "description": "Branch name (defaults to 'main')",
                 },
-                "required": ["repo", "file_path"],
             },
-        ),
-        Tool(
-            name="grep_github_repo",
-            description="Search for code content in a GitHub repository (grep-like search)",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "repo": {
-                        "type": "string",
-                        "description": "Repository in format 'owner/repo'",
-                    },
-                    "query": {
-                        "type": "string",
-                        "description": "Code content to search for",
-                    },
-                    "path": {
-                        "type": "string",
-                        "description": "Optional path prefix to search within",
+            "required": ["repo", "file_path"],
+        },
+    ),
+    Tool(
+        name="read_github_files",
+        description="Read several files from a GitHub repository at once",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "repo": _REPO_PROPERTY,
+                "file_paths": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "Paths to the files in the repository",
+                },
+                "branch": {
+                    "type": "string",
+                    "description": "Branch name (defaults to 'main')",
+                },
+            },
+            "required": ["repo", "file_paths"],
+        },
+    ),
+    Tool(
+        name="grep_github_repo",
+        description="Search for code content in a GitHub repository (grep-like search)",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "repo": _REPO_PROPERTY,
+                "query": {
+                    "type": "string",
+                    "description": "Code content to search for",
+                },
+                "path": {
+                    "type": "string",
+                    "description": "Optional path prefix to search within",
+                },
+            },
+            "required": ["repo", "query"],
+        },
+    ),
+    Tool(
+        name="batch_github",
+        description="Run several GitHub tool calls concurrently and return all of their results",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "requests": {
+                    "type": "array",
+                    "description": "GitHub tool calls to run, results are returned in the same order",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "tool": {
+                                "type": "string",
+                                "enum": GITHUB_TOOLS,
+                                "description": "Name of the GitHub tool to call",
+                            },
+                            "args": {
+                                "type": "object",
+                                "description": "Arguments for the tool, as for a direct call",
+                            },
+                        },
+                        "required": ["tool", "args"],
                     },
                 },
-                "required": ["repo", "query"],
             },
-        ),
-    ]
+            "required": ["requests"],
+        },
+    ),
+)
+
+# Input schemas by tool name, to validate batched calls the SDK never sees
+_SCHEMAS = {tool.name: tool.inputSchema for tool in _TOOLS}
+
+
+@app.list_tools()
+async def list_tools() -> list[Tool]:
+    """List available MCP tools."""
+    # A fresh list, so callers cannot alter the shared registry
+    return list(_TOOLS)
 
 
 @app.call_tool()
 async def call_tool(name: str, arguments: Any) -> list[TextContent]:
     """Handle tool execution."""
 
-    if name == "search_files":
-        from .tools.search import search_files
-        result = await search_files(
-            query=arguments["query"],
-            search_type=arguments["search_type"],
-            path=arguments.get("path", "."),
-        )
-        return [TextContent(type="text", text=result)]
-
-    elif name == "read_file":
-        from .tools.read import read_file
-        result = await read_file(file_path=arguments["file_path"])
-        return [TextContent(type="text", text=result)]
-
-    elif name == "get_pr_diff":
-        from .tools.github import get_pr_diff
-        result = await get_pr_diff(
-            repo=arguments["repo"],
-            pr_number=arguments["pr_number"],
-        )
-        return [TextContent(type="text", text=result)]
-
-    elif name == "search_github_files":
-        from .tools.github import search_github_files
-        result = await search_github_files(
-            repo=arguments["repo"],
-            query=arguments["query"],
-            path=arguments.get("path"),
-        )
-        return [TextContent(type="text", text=result)]
-
-    elif name == "read_github_file":
-        from .tools.github import read_github_file
-        result = await read_github_file(
-            repo=arguments["repo"],
-            file_path=arguments["file_path"],
-            branch=arguments.get("branch", "main"),
-        )
-        return [TextContent(type="text", text=result)]
-
-    elif name == "grep_github_repo":
-        from .tools.github import grep_github_repo
-        result = await grep_github_repo(
-            repo=arguments["repo"],
-            query=arguments["query"],
-            path=arguments.get("path"),
-        )
-        return [TextContent(type="text", text=result)]
+    if name == "batch_github":
+        return await _batch_github(arguments["requests"])
+
+    result = await _run_tool(name, arguments)
+    return [TextContent(type="text", text=result)]
+
+
+async def _batch_github(requests: list[dict]) -> list[TextContent]:
+    """Run GitHub tool calls concurrently, one result per request."""
+
+    async def run(request: dict) -> str:
+        tool = request["tool"]
+        if tool not in GITHUB_TOOLS:
+            raise ValueError(f"Tool cannot be batched: {tool}")
 
-    else:
+        args = request.get("args", {})
+        try:
+            jsonschema.validate(args, _SCHEMAS[tool])
+        except jsonschema.ValidationError as e:
+            raise ValueError(f"Invalid arguments: {e.message}") from e
+
+        return await _run_tool(tool, args)
+
+    results = await asyncio.gather(
+        *(run(request) for request in requests),
+        return_exceptions=True,
+    )
+
+    contents = []
+    for request, result in zip(requests, results):
+        if isinstance(result, Exception):
+            result = f"Error running {request.get('tool')}: {str(result)}"
+        contents.append(TextContent(type="text", text=result))
+
+    return contents
+
+
+async def _run_tool(name: str, arguments: Any) -> str:
+    """Run a single tool and return its text result."""
+    handler = _DISPATCH.get(name)
+    if handler is None:
         raise ValueError(f"Unknown tool: {name}")
 
+    return await handler(arguments)
+
 
 async def main():
     """Run the MCP server."""
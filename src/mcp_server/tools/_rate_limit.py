@@ -0,0 +1,31 @@
+"""
+Client-side rate limiting for outgoing API requests.
+"""
+
+import time
+import asyncio
+
+
+class TokenBucket:
+    """
+    Admit requests at a steady rate, allowing bursts of up to capacity.
+
+    Callers reserve a token before they wait for it, so concurrent callers
+    are admitted in order without needing a lock.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+
+    async def acquire(self) -> None:
+        """Wait until a request may be sent."""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+        self._tokens -= 1
+        if self._tokens < 0:
+            await asyncio.sleep(-self._tokens / self.rate)
@@ -0,0 +1,30 @@
+"""
+Detection of files that may contain secrets.
+"""
+
+import os
+import re
+
+# Name fragments of files that must never be read or listed
+SENSITIVE_PATTERNS = (
+    ".env",
+    ".env.local",
+    ".env.production",
+    "credentials",
+    "secrets",
+    "private_key",
+    ".pem",
+    ".key",
+    "id_rsa",
+    "id_dsa",
+)
+
+_SENSITIVE_RE = re.compile(
+    "|".join(map(re.escape, SENSITIVE_PATTERNS)),
+    re.IGNORECASE,
+)
+
+
+def is_sensitive_file(path: str | os.PathLike) -> bool:
+    """Check if a file name suggests the file contains sensitive information."""
+    return _SENSITIVE_RE.search(os.path.basename(path)) is not None
@@ -3,9 +3,87 @@ GitHub API integration for PR analysis, file search, and file reading.
 """
 
 import os
+import re
+import time
+import random
+import asyncio
 import base64
+import functools
 from typing import Optional
+from urllib.parse import quote
 import httpx
+import orjson
+from cachetools import LRUCache, TTLCache
+
+from ._rate_limit import TokenBucket
+
+__all__ = [
+    "get_pr_diff",
+    "search_github_files",
+    "read_github_file",
+    "read_github_files",
+    "grep_github_repo",
+    "close_client",
+]
+
+# Shared client so connections (and their TLS sessions) are reused across calls,
+# along with the event loop it was created on
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+# Repository names in 'owner/repo' form, as accepted by GitHub; owners have
+# no dots and repos cannot be '.' or '..', so neither can climb the URL path
+_REPO_RE = re.compile(r"^[A-Za-z0-9_-]+/(?!\.\.?$)[A-Za-z0-9_.-]+$")
+
+# Empty, '.' or '..' segments (or NULs) in a file path, which httpx would
+# collapse and so let the path climb out of the contents endpoint
+_BAD_PATH_RE = re.compile(r"(?:^|/)\.{0,2}(?:/|$)|\x00")
+
+# Most files fetched at once by read_github_files, to stay clear of
+# GitHub's secondary rate limits
+MAX_CONCURRENT_READS = 10
+
+# Retries after a rate limit, server error or network failure
+MAX_RETRIES = 3
+
+# Backoff before retry n is about RETRY_BASE_DELAY * 2**n seconds, capped
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 30.0
+
+# Request budgets matching GitHub's documented limits: 30 searches a minute
+# and 5000 other requests an hour, spent ahead of time to avoid rate limit errors
+_BUCKETS = {
+    "search": TokenBucket(rate=30 / 60, capacity=30),
+    "core": TokenBucket(rate=5000 / 3600, capacity=100),
+}
+
+# Statuses that are always worth retrying
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Largest PR diff returned before giving up, in bytes
+MAX_DIFF_BYTES = 10 * 1024 * 1024
+
+# Largest file read_github_file will return, in bytes
+MAX_FILE_BYTES = 10 * 1024 * 1024
+
+# Total size of the response and file caches below, and the largest body
+# either will hold, in bytes; bigger bodies are always fetched again
+CACHE_MAX_BYTES = 32 * 1024 * 1024
+CACHE_MAX_ENTRY_BYTES = 1024 * 1024
+
+# Earlier 200 responses that carried an ETag, keyed by full request URL,
+# with the least recently used bodies dropped once the total size is reached
+_etag_cache: LRUCache = LRUCache(
+    maxsize=CACHE_MAX_BYTES,
+    getsizeof=lambda response: len(response.content),
+)
+
+# Recently read GitHub file contents, keyed by (repo, file_path, branch)
+_file_cache: TTLCache = TTLCache(maxsize=CACHE_MAX_BYTES, ttl=300, getsizeof=len)
+
+# Recent successful search results, keyed by (tool, repo, query, path); kept
+# briefly since the index changes, but long enough to absorb repeated searches
+_search_cache: TTLCache = TTLCache(maxsize=256, ttl=60)
 
 
 async def get_pr_diff(repo: str, pr_number: int) -> str:
@@ -19,31 +97,31 @@ async def get_pr_diff(repo: str, pr_number: int) -> str:
     Returns:
         PR diff as string
     """
+    if not _REPO_RE.match(repo):
+        return _invalid_repo(repo)
+    # bool is an int subclass, and strings could carry extra path segments
+    if type(pr_number) is not int or pr_number < 1:
+        return f"Error: Invalid PR number {pr_number!r}, expected a positive integer"
+
     try:
         # GitHub API endpoint
         url = f"https://api.github.com/repos/{repo}/pulls/{pr_number}"
 
-        # Get GitHub token from environment if available
-        headers = {
-            "Accept": "application/vnd.github.v3.diff",
-        }
-
-        github_token = os.environ.get("GITHUB_TOKEN")
-        if github_token:
-            headers["Authorization"] = f"Bearer {github_token}"
-
-        # Fetch PR diff
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers, timeout=30.0)
-
-            if response.status_code == 200:
-                return response.text
-            elif response.status_code == 404:
-                return f"Error: PR #{pr_number} not found in {repo}"
-            elif response.status_code == 403:
-                return "Error: Rate limit exceeded or authentication required. Set GITHUB_TOKEN environment variable."
-            else:
-                return f"Error: GitHub API returned status {response.status_code}"
+        headers = _get_github_headers("application/vnd.github.v3.diff")
+
+        # Stream the PR diff so oversized diffs are rejected without buffering them
+        response = await _get_limited(url, headers, limit=MAX_DIFF_BYTES)
+
+        if response is None:
+            return f"Error: PR #{pr_number} diff is larger than {MAX_DIFF_BYTES} bytes"
+        elif response.status_code == 200:
+            return response.text
+        elif response.status_code == 404:
+            return f"Error: PR #{pr_number} not found in {repo}"
+        elif response.status_code == 403:
+            return "Error: Rate limit exceeded or authentication required. Set GITHUB_TOKEN environment variable."
+        else:
+            return f"Error: GitHub API returned status {response.status_code}"
 
     except httpx.TimeoutException:
         return "Error: Request timed out"
@@ -67,6 +145,13 @@ async def search_github_files(
     Returns:
         List of matching files with their paths
     """
+    if not _REPO_RE.match(repo):
+        return _invalid_repo(repo)
+
+    cache_key = ("files", repo, query, path)
+    if cache_key in _search_cache:
+        return _search_cache[cache_key]
+
     try:
         # Build search query
         search_query = f"repo:{repo} filename:{query}"
@@ -78,32 +163,27 @@ async def search_github_files(
 
         headers = _get_github_headers()
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers, params=params, timeout=30.0)
-
-            if response.status_code == 200:
-                data = response.json()
-                total_count = data.get("total_count", 0)
+        response = await _get(url, headers, params)
 
-                if total_count == 0:
-                    return f"No files found matching: {query}"
+        if response.status_code == 200:
+            data = _loads(response)
+            total_count = data.get("total_count", 0)
 
-                items = data.get("items", [])
-                result = f"Found {total_count} files (showing first {len(items)}):\n\n"
+            if total_count == 0:
+                result = f"No files found matching: {query}"
+            else:
+                parts = _format_search_items(data, f"Found {total_count} files")
+                result = "\n\n".join(parts) + "\n\n"
 
-                for item in items:
-                    file_path = item.get("path", "")
-                    html_url = item.get("html_url", "")
-                    result += f"  📄 {file_path}\n     {html_url}\n\n"
+            _search_cache[cache_key] = result
+            return result
 
-                return result
-
-            elif response.status_code == 403:
-                return "Error: Rate limit exceeded or authentication required. Set GITHUB_TOKEN environment variable."
-            elif response.status_code == 422:
-                return f"Error: Invalid search query. Check your search parameters."
-            else:
-                return f"Error: GitHub API returned status {response.status_code}"
+        elif response.status_code == 403:
+            return "Error: Rate limit exceeded or authentication required. Set GITHUB_TOKEN environment variable."
+        elif response.status_code == 422:
+            return f"Error: Invalid search query. Check your search parameters."
+        else:
+            return f"Error: GitHub API returned status {response.status_code}"
 
     except httpx.TimeoutException:
         return "Error: Request timed out"
@@ -127,18 +207,34 @@ async def read_github_file(
     Returns:
         File contents as string
     """
+    if not _REPO_RE.match(repo):
+        return _invalid_repo(repo)
+    if _BAD_PATH_RE.search(file_path):
+        return _invalid_path(file_path)
+
+    cache_key = (repo, file_path, branch)
+    if cache_key in _file_cache:
+        return _file_cache[cache_key]
+
     try:
         # GitHub API endpoint for file contents
-        url = f"https://api.github.com/repos/{repo}/contents/{file_path}"
+        # Escape '?', '#' and '%' so the path cannot alter the query either
+        url = f"https://api.github.com/repos/{repo}/contents/{quote(file_path)}"
         params = {"ref": branch}
 
-        headers = _get_github_headers()
+        # Ask for the raw file body, skipping the base64-in-JSON wrapping
+        headers = _get_github_headers("application/vnd.github.raw")
+
+        response = await _get_limited(url, headers, params, limit=MAX_FILE_BYTES)
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers, params=params, timeout=30.0)
+        if response is None:
+            return f"Error: {file_path} is larger than {MAX_FILE_BYTES} bytes"
+        elif response.status_code == 200:
+            content_type = response.headers.get("Content-Type", "")
 
-            if response.status_code == 200:
-                data = response.json()
+            if content_type.startswith("application/json"):
+                # Directories have no raw form and are still described in JSON
+                data = _loads(response)
 
                 # Check if it's a file (not a directory)
                 if data.get("type") != "file":
@@ -149,18 +245,26 @@ async def read_github_file(
                 if not content_base64:
                     return "Error: File content is empty or unavailable"
 
-                try:
-                    content = base64.b64decode(content_base64).decode("utf-8")
-                    return content
-                except UnicodeDecodeError:
-                    return f"Error: File is not a text file or has unsupported encoding"
-
-            elif response.status_code == 404:
-                return f"Error: File not found: {file_path} (branch: {branch})"
-            elif response.status_code == 403:
-                return "Error: Rate limit exceeded or authentication required. Set GITHUB_TOKEN environment variable."
+                # GitHub wraps the base64 in newlines, which b64decode skips
+                raw = base64.b64decode(content_base64.encode("ascii"))
             else:
-                return f"Error: GitHub API returned status {response.status_code}"
+                raw = response.content
+
+            try:
+                content = raw.decode("utf-8")
+            except UnicodeDecodeError:
+                return f"Error: File is not a text file or has unsupported encoding"
+
+            if len(content) <= CACHE_MAX_ENTRY_BYTES:
+                _file_cache[cache_key] = content
+            return content
+
+        elif response.status_code == 404:
+            return f"Error: File not found: {file_path} (branch: {branch})"
+        elif response.status_code == 403:
+            return "Error: Rate limit exceeded or authentication required. Set GITHUB_TOKEN environment variable."
+        else:
+            return f"Error: GitHub API returned status {response.status_code}"
 
     except httpx.TimeoutException:
         return "Error: Request timed out"
@@ -168,6 +272,48 @@ async def read_github_file(
         return f"Error reading GitHub file: {str(e)}"
 
 
+async def read_github_files(
+    repo: str,
+    file_paths: list[str],
+    branch: str = "main",
+) -> str:
+    """
+    Read several files from a GitHub repository concurrently.
+
+    Args:
+        repo: Repository in format 'owner/repo'
+        file_paths: Paths to the files in the repository
+        branch: Branch name (defaults to "main")
+
+    Returns:
+        Contents of each file under a header with its path
+    """
+    if not _REPO_RE.match(repo):
+        return _invalid_repo(repo)
+    for file_path in file_paths:
+        if _BAD_PATH_RE.search(file_path):
+            return _invalid_path(file_path)
+
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_READS)
+
+    async def read_one(file_path: str) -> str:
+        async with semaphore:
+            return await read_github_file(repo, file_path, branch)
+
+    results = await asyncio.gather(
+        *(read_one(file_path) for file_path in file_paths),
+        return_exceptions=True,
+    )
+
+    parts = []
+    for file_path, result in zip(file_paths, results):
+        if isinstance(result, Exception):
+            result = f"Error reading GitHub file: {str(result)}"
+        parts.append(f"=== {file_path} ===\n{result}")
+
+    return "\n\n".join(parts)
+
+
 async def grep_github_repo(
     repo: str,
     query: str,
@@ -184,6 +330,13 @@ async def grep_github_repo(
     Returns:
         Search results with file paths and matching lines
     """
+    if not _REPO_RE.match(repo):
+        return _invalid_repo(repo)
+
+    cache_key = ("code", repo, query, path)
+    if cache_key in _search_cache:
+        return _search_cache[cache_key]
+
     try:
         # Build search query
         search_query = f"repo:{repo} {query}"
@@ -195,33 +348,28 @@ async def grep_github_repo(
 
         headers = _get_github_headers()
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers, params=params, timeout=30.0)
-
-            if response.status_code == 200:
-                data = response.json()
-                total_count = data.get("total_count", 0)
-
-                if total_count == 0:
-                    return f"No matches found for: {query}"
+        response = await _get(url, headers, params)
 
-                items = data.get("items", [])
-                result = f"Found {total_count} matches (showing first {len(items)}):\n\n"
+        if response.status_code == 200:
+            data = _loads(response)
+            total_count = data.get("total_count", 0)
 
-                for item in items:
-                    file_path = item.get("path", "")
-                    html_url = item.get("html_url", "")
-                    result += f"  📄 {file_path}\n     {html_url}\n\n"
+            if total_count == 0:
+                result = f"No matches found for: {query}"
+            else:
+                parts = _format_search_items(data, f"Found {total_count} matches")
+                parts.append("\nNote: Use read_github_file to view full file contents.")
+                result = "\n\n".join(parts)
 
-                result += "\nNote: Use read_github_file to view full file contents."
-                return result
+            _search_cache[cache_key] = result
+            return result
 
-            elif response.status_code == 403:
-                return "Error: Rate limit exceeded or authentication required. Set GITHUB_TOKEN environment variable."
-            elif response.status_code == 422:
-                return f"Error: Invalid search query. Try a more specific search."
-            else:
-                return f"Error: GitHub API returned status {response.status_code}"
+        elif response.status_code == 403:
+            return "Error: Rate limit exceeded or authentication required. Set GITHUB_TOKEN environment variable."
+        elif response.status_code == 422:
+            return f"Error: Invalid search query. Try a more specific search."
+        else:
+            return f"Error: GitHub API returned status {response.status_code}"
 
     except httpx.TimeoutException:
         return "Error: Request timed out"
@@ -229,10 +377,44 @@ async def grep_github_repo(
         return f"Error searching GitHub code: {str(e)}"
 
 
-def _get_github_headers() -> dict:
-    """Get standard headers for GitHub API requests."""
+def _invalid_repo(repo: str) -> str:
+    """Error message for a repository argument that is not 'owner/repo'."""
+    return f"Error: Invalid repository '{repo}', expected format 'owner/repo'"
+
+
+def _invalid_path(file_path: str) -> str:
+    """Error message for a file path with empty, '.' or '..' segments."""
+    return f"Error: Invalid file path {file_path!r}"
+
+
+def _loads(response: httpx.Response):
+    """Parse a JSON response body straight from its bytes with orjson."""
+    return orjson.loads(response.content)
+
+
+def _format_search_items(data: dict, summary: str) -> list[str]:
+    """Format a code search response as a header plus one entry per item."""
+    items = data.get("items", [])
+    parts = [f"{summary} (showing first {len(items)}):"]
+
+    # Only the path and URL are used from each (large) search item
+    for item in items:
+        parts.append(f"  📄 {item.get('path', '')}\n     {item.get('html_url', '')}")
+
+    return parts
+
+
+@functools.cache
+def _get_github_headers(accept: str = "application/vnd.github.v3+json") -> dict:
+    """
+    Get standard headers for GitHub API requests.
+
+    Built once per media type and shared between calls, so callers must copy
+    rather than modify the result. GITHUB_TOKEN is read on the first call;
+    use _get_github_headers.cache_clear() to pick up a changed token.
+    """
     headers = {
-        "Accept": "application/vnd.github.v3+json",
+        "Accept": accept,
         "X-GitHub-Api-Version": "2022-11-28",
     }
 
@@ -241,3 +423,198 @@ def _get_github_headers() -> dict:
         headers["Authorization"] = f"Bearer {github_token}"
 
     return headers
+
+
+async def _get_client() -> httpx.AsyncClient:
+    """
+    Get the shared HTTP client, creating it on first use.
+
+    Pooled connections belong to the event loop that opened them, so a client
+    is only reused on the loop it was created on. Creation never awaits, which
+    keeps concurrent callers on one loop from building two clients.
+    """
+    global _client, _client_loop
+
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client = _new_client()
+        _client_loop = loop
+
+    return _client
+
+
+def _new_client() -> httpx.AsyncClient:
+    """Create an HTTP client, multiplexing requests over HTTP/2 when available."""
+    options = {
+        "timeout": 30.0,
+        "limits": httpx.Limits(max_keepalive_connections=20, max_connections=50),
+    }
+
+    try:
+        return httpx.AsyncClient(http2=True, **options)
+    except ImportError:
+        # HTTP/2 needs the optional h2 package: pip install "mcp-server[http2]"
+        return httpx.AsyncClient(**options)
+
+
+async def _get(url: str, headers: dict, params: Optional[dict] = None) -> httpx.Response:
+    """
+    GET a GitHub API URL, revalidating any cached copy with its ETag.
+
+    GitHub answers a matching If-None-Match with an empty 304 that does not
+    count against the rate limit, in which case the cached response is returned.
+    """
+    key = str(httpx.URL(url, params=params))
+
+    cached = _etag_cache.get(key)
+    if cached is not None:
+        headers = {**headers, "If-None-Match": cached.headers["ETag"]}
+
+    response = await _send(url, headers, params)
+
+    if response.status_code == 304 and cached is not None:
+        return cached
+
+    _cache_etag(key, response)
+    return response
+
+
+async def _get_limited(
+    url: str,
+    headers: dict,
+    params: Optional[dict] = None,
+    *,
+    limit: int,
+) -> Optional[httpx.Response]:
+    """
+    GET a GitHub API URL like _get, or None if its body exceeds limit bytes.
+
+    The body is streamed, so oversized responses are rejected without
+    buffering them; the returned response is a fully read copy.
+    """
+    key = str(httpx.URL(url, params=params))
+
+    cached = _etag_cache.get(key)
+    if cached is not None:
+        headers = {**headers, "If-None-Match": cached.headers["ETag"]}
+
+    response = await _send(url, headers, params, stream=True)
+    try:
+        if response.status_code == 304 and cached is not None:
+            return cached
+
+        body = await _read_limited(response, limit)
+    finally:
+        await response.aclose()
+
+    if body is None:
+        return None
+
+    # Keep only headers that still describe the decoded body
+    kept = {name: response.headers[name] for name in ("Content-Type", "ETag") if name in response.headers}
+    response = httpx.Response(response.status_code, headers=kept, content=body)
+
+    _cache_etag(key, response)
+    return response
+
+
+def _cache_etag(key: str, response: httpx.Response) -> None:
+    """Keep a 200 response for ETag revalidation, unless its body is too large."""
+    if (
+        response.status_code == 200
+        and "ETag" in response.headers
+        and len(response.content) <= CACHE_MAX_ENTRY_BYTES
+    ):
+        _etag_cache[key] = response
+
+
+async def _send(
+    url: str,
+    headers: dict,
+    params: Optional[dict] = None,
+    stream: bool = False,
+) -> httpx.Response:
+    """
+    GET a URL, retrying rate limits, server errors and network failures.
+
+    Every attempt first waits for the matching request budget. Retries wait for
+    GitHub's Retry-After or rate limit reset when given, and otherwise back off
+    exponentially with jitter. A streamed response must be closed by the caller.
+    """
+    client = await _get_client()
+    bucket = _BUCKETS["search" if url.startswith("https://api.github.com/search/") else "core"]
+    attempt = 0
+
+    while True:
+        await bucket.acquire()
+        request = client.build_request("GET", url, headers=headers, params=params)
+
+        try:
+            response = await client.send(request, stream=stream)
+        except (httpx.NetworkError, httpx.ConnectTimeout):
+            if attempt >= MAX_RETRIES:
+                raise
+            delay = _backoff_delay(attempt)
+        else:
+            delay = _retry_delay(response, attempt)
+            if delay is None or attempt >= MAX_RETRIES:
+                return response
+            await response.aclose()
+
+        await asyncio.sleep(delay)
+        attempt += 1
+
+
+def _retry_delay(response: httpx.Response, attempt: int) -> Optional[float]:
+    """Seconds to wait before retrying a response, or None if it is final."""
+    rate_limited = response.status_code == 403 and (
+        "Retry-After" in response.headers
+        or response.headers.get("X-RateLimit-Remaining") == "0"
+    )
+    if response.status_code not in _RETRY_STATUSES and not rate_limited:
+        # Includes plain 403s (bad or missing token) and 404s
+        return None
+
+    retry_after = response.headers.get("Retry-After", "")
+    reset = response.headers.get("X-RateLimit-Reset", "")
+    if retry_after.isdigit():
+        delay = float(retry_after)
+    elif rate_limited and reset.isdigit():
+        delay = max(0.0, int(reset) - time.time())
+    else:
+        return _backoff_delay(attempt)
+
+    # Not worth holding the tool call open for a long rate limit window
+    return delay if delay <= RETRY_MAX_DELAY else None
+
+
+def _backoff_delay(attempt: int) -> float:
+    """Exponential backoff with jitter for the given retry attempt."""
+    delay = RETRY_BASE_DELAY * 2**attempt * (1 + random.random() * 0.5)
+    return min(RETRY_MAX_DELAY, delay)
+
+
+async def _read_limited(response: httpx.Response, limit: int) -> Optional[bytes]:
+    """Read a streamed response body, or None if it exceeds limit bytes."""
+    # Reject bodies declared too large before downloading any of them
+    content_length = response.headers.get("Content-Length", "")
+    if content_length.isdigit() and int(content_length) > limit:
+        return None
+
+    body = bytearray()
+    async for chunk in response.aiter_bytes(65536):
+        body += chunk
+        if len(body) > limit:
+            return None
+
+    return bytes(body)
+
+
+async def close_client() -> None:
+    """Close the shared HTTP client, if one has been created."""
+    global _client, _client_loop
+
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+        _client_loop = None
@@ -3,7 +3,22 @@ Safe file reading with path validation.
 """
 
 import os
+import mmap
+import asyncio
 from pathlib import Path
+from typing import Optional
+
+from ._sensitive import is_sensitive_file as _is_sensitive_file
+
+__all__ = [
+    "read_file",
+]
+
+# Files larger than this are decoded straight from a memory map, in bytes
+MMAP_THRESHOLD = 1024 * 1024
+
+# Largest file read_file will return, in bytes
+MAX_FILE_BYTES = 10 * 1024 * 1024
 
 
 async def read_file(file_path: str, root_dir: str = ".") -> str:
@@ -18,27 +33,30 @@ async def read_file(file_path: str, root_dir: str = ".") -> str:
         File contents as string
     """
     try:
-        # Resolve absolute paths and validate
-        abs_root = os.path.abspath(root_dir)
-        abs_file = os.path.abspath(file_path)
+        # Resolve absolute paths (following symlinks) and validate
+        root = Path(root_dir).resolve()
+        target = Path(file_path).resolve()
 
         # Ensure the file is within the allowed root directory
-        if not abs_file.startswith(abs_root):
+        if not target.is_relative_to(root):
             return f"Error: Access denied - file is outside allowed directory"
 
+        abs_file = str(target)
+
         # Check if file exists
         if not os.path.isfile(abs_file):
             return f"Error: File not found: {file_path}"
 
         # Check if file is sensitive
-        if _is_sensitive_file(Path(abs_file)):
+        if _is_sensitive_file(target):
             return f"Error: Cannot read sensitive file: {file_path}"
 
-        # Read file contents
-        with open(abs_file, 'r', encoding='utf-8') as f:
-            content = f.read()
+        # Read and decode file contents off the event loop
+        text = await asyncio.to_thread(_read_text, abs_file, MAX_FILE_BYTES)
+        if text is None:
+            return f"Error: File is larger than {MAX_FILE_BYTES} bytes: {file_path}"
 
-        return content
+        return text
 
     except UnicodeDecodeError:
         return f"Error: File is not a text file or has unsupported encoding: {file_path}"
@@ -48,20 +66,30 @@ async def read_file(file_path: str, root_dir: str = ".") -> str:
         return f"Error reading file: {str(e)}"
 
 
-def _is_sensitive_file(path: Path) -> bool:
-    """Check if a file contains sensitive information."""
-    sensitive_patterns = {
-        ".env",
-        ".env.local",
-        ".env.production",
-        "credentials",
-        "secrets",
-        "private_key",
-        ".pem",
-        ".key",
-        "id_rsa",
-        "id_dsa",
-    }
-
-    name_lower = path.name.lower()
-    return any(pattern in name_lower for pattern in sensitive_patterns)
+def _read_text(path: str, limit: int) -> Optional[str]:
+    """Read a whole file as UTF-8 text, or None if it exceeds limit bytes."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        size = os.fstat(fd).st_size
+        if size > limit:
+            return None
+
+        # Decode large files from the page cache without an intermediate bytes copy
+        if size > MMAP_THRESHOLD:
+            with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as mapped:
+                return str(mapped, "utf-8")
+
+        chunks = [os.read(fd, size)]
+        total = len(chunks[0])
+
+        # Files that grow (or report no size) need further reads until EOF
+        while chunk := os.read(fd, max(size, 65536)):
+            total += len(chunk)
+            if total > limit:
+                return None
+            chunks.append(chunk)
+    finally:
+        os.close(fd)
+
+    data = b"".join(chunks) if len(chunks) > 1 else chunks[0]
+    return data.decode("utf-8")
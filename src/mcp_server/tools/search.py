@@ -3,8 +3,42 @@ File search implementation (glob and grep).
 """
 
 import os
-import subprocess
-from pathlib import Path
+import re
+import mmap
+import queue
+import threading
+import asyncio
+import fnmatch
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from ._sensitive import is_sensitive_file as _is_sensitive_file
+
+__all__ = [
+    "search_files",
+]
+
+# Directories never descended into by glob search
+_PRUNE_DIRS = {".git", "node_modules"}
+
+# Threads scanning directories concurrently during a walk
+_WALK_WORKERS = min(32, (os.cpu_count() or 1) * 2)
+
+# Most files listed by a glob search
+MAX_GLOB_RESULTS = 1000
+
+# Most grep output returned to the caller, in bytes
+MAX_GREP_OUTPUT = 1024 * 1024
+
+# Limits for the in-process grep, mirroring the rg options used
+GREP_MAX_COUNT = 200
+GREP_MAX_COLUMNS = 500
+
+# Leading bytes checked for NUL to detect binary files
+GREP_BINARY_SNIFF = 8192
+
+# Files larger than this are scanned through a memory map, in bytes
+GREP_MMAP_THRESHOLD = 64 * 1024
 
 
 async def search_files(query: str, search_type: str, path: str = ".") -> str:
@@ -33,17 +67,17 @@ async def search_files(query: str, search_type: str, path: str = ".") -> str:
 async def _search_by_glob(pattern: str, root_path: str) -> str:
     """Search files by name pattern using glob."""
     try:
-        root = Path(root_path)
-        matches = list(root.glob(pattern))
+        matches = await asyncio.to_thread(_glob_files, pattern, root_path)
 
         if not matches:
             return f"No files found matching pattern: {pattern}"
 
-        # Filter out sensitive files
-        filtered = [m for m in matches if not _is_sensitive_file(m)]
+        if len(matches) >= MAX_GLOB_RESULTS:
+            result = f"Found {len(matches)} files (stopped at {MAX_GLOB_RESULTS}):\n"
+        else:
+            result = f"Found {len(matches)} files:\n"
 
-        result = f"Found {len(filtered)} files:\n"
-        for match in sorted(filtered):
+        for match in sorted(matches):
             result += f"  {match}\n"
 
         return result
@@ -51,60 +85,212 @@ async def _search_by_glob(pattern: str, root_path: str) -> str:
         return f"Error during glob search: {str(e)}"
 
 
+def _glob_files(pattern: str, root_path: str) -> list[str]:
+    """
+    Find non-sensitive files under root_path matching a glob pattern.
+
+    Patterns without a "/" match file names at any depth, patterns with one
+    match the path relative to root_path. As "*" also matches across
+    directories, a "**/" component is redundant and ignored. At most
+    MAX_GLOB_RESULTS files are returned.
+    """
+    pattern = pattern.replace("**/", "")
+    regex = re.compile(fnmatch.translate(pattern))
+    match_name = "/" not in pattern
+    prefix_len = len(os.path.join(root_path, ""))
+
+    def keep(file_path: str) -> bool:
+        if match_name:
+            target = os.path.basename(file_path)
+        else:
+            target = file_path[prefix_len:].replace(os.sep, "/")
+        return regex.match(target) is not None and not _is_sensitive_file(file_path)
+
+    return _walk(root_path, keep, limit=MAX_GLOB_RESULTS)
+
+
+def _walk(
+    root: str,
+    keep: Callable[[str], bool],
+    limit: Optional[int] = None,
+) -> list[str]:
+    """
+    Collect the files under root accepted by keep, skipping pruned directories.
+
+    Directories are scanned by a pool of threads pulling from a shared queue,
+    so the time spent waiting on the filesystem overlaps. The walk stops early
+    once limit files have been found.
+    """
+    pending: queue.Queue[Optional[str]] = queue.Queue()
+    pending.put(root)
+
+    found_count = 0
+    count_lock = threading.Lock()
+    stop = threading.Event()
+
+    def worker() -> list[str]:
+        nonlocal found_count
+        found = []
+        while (directory := pending.get()) is not None:
+            try:
+                # Once stopped, remaining directories are only drained
+                if stop.is_set():
+                    continue
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name not in _PRUNE_DIRS:
+                                pending.put(entry.path)
+                        elif keep(entry.path):
+                            found.append(entry.path)
+                            if limit is not None:
+                                with count_lock:
+                                    found_count += 1
+                                    if found_count >= limit:
+                                        stop.set()
+                                if stop.is_set():
+                                    break
+            except OSError:
+                pass
+            finally:
+                pending.task_done()
+        return found
+
+    with ThreadPoolExecutor(max_workers=_WALK_WORKERS) as pool:
+        workers = [pool.submit(worker) for _ in range(_WALK_WORKERS)]
+
+        # Every directory is queued before its parent is marked done
+        pending.join()
+        for _ in workers:
+            pending.put(None)
+
+        files = [file_path for w in workers for file_path in w.result()]
+
+    return files[:limit] if limit is not None else files
+
+
 async def _search_by_grep(pattern: str, root_path: str) -> str:
-    """Search file contents using ripgrep (rg) or git grep."""
+    """Search file contents using ripgrep (rg), or an in-process scan without it."""
     try:
-        # Try ripgrep first (faster)
         try:
-            result = subprocess.run(
-                ["rg", "--line-number", "--heading", pattern, root_path],
-                capture_output=True,
-                text=True,
-                timeout=30,
+            # Try ripgrep first (faster)
+            returncode, stdout, stderr = await _run_command(
+                [
+                    "rg",
+                    "--line-number",
+                    "--heading",
+                    f"--max-count={GREP_MAX_COUNT}",
+                    f"--max-columns={GREP_MAX_COLUMNS}",
+                    pattern,
+                    root_path,
+                ],
             )
-
-            if result.returncode == 0:
-                return result.stdout or "No matches found"
-            elif result.returncode == 1:
-                return "No matches found"
-            else:
-                return f"Error: {result.stderr}"
-
         except FileNotFoundError:
-            # Fallback to git grep if rg not available
-            result = subprocess.run(
-                ["git", "grep", "-n", pattern],
-                cwd=root_path,
-                capture_output=True,
-                text=True,
-                timeout=30,
-            )
+            # Without rg, scan in-process rather than spawning another tool
+            stdout = await asyncio.to_thread(_grep_files, pattern, root_path)
+            returncode, stderr = (0 if stdout else 1), b""
 
-            if result.returncode == 0:
-                return result.stdout or "No matches found"
-            elif result.returncode == 1:
-                return "No matches found"
-            else:
-                return f"Error: {result.stderr}"
+        if returncode == 0:
+            return _decode_output(stdout) or "No matches found"
+        elif returncode == 1:
+            return "No matches found"
+        else:
+            return f"Error: {_decode_output(stderr)}"
 
-    except subprocess.TimeoutExpired:
+    except TimeoutError:
         return "Search timed out after 30 seconds"
     except Exception as e:
         return f"Error during grep search: {str(e)}"
 
 
-def _is_sensitive_file(path: Path) -> bool:
-    """Check if a file should be filtered from search results."""
-    sensitive_patterns = {
-        ".env",
-        ".env.local",
-        ".env.production",
-        "credentials",
-        "secrets",
-        "private_key",
-        ".pem",
-        ".key",
-    }
-
-    name_lower = path.name.lower()
-    return any(pattern in name_lower for pattern in sensitive_patterns)
+def _grep_files(pattern: str, root_path: str) -> bytes:
+    """
+    Search the non-sensitive text files under root_path for a regex.
+
+    Output follows rg --heading: each matching file's path, then one
+    "line:text" entry per matching line, with a blank line between files.
+    """
+    regex = re.compile(pattern.encode("utf-8"), re.MULTILINE)
+    files = _walk(root_path, lambda file_path: not _is_sensitive_file(file_path))
+
+    blocks = []
+    for file_path in sorted(files):
+        lines = _grep_file(regex, file_path)
+        if lines:
+            blocks.append(b"\n".join([file_path.encode("utf-8"), *lines]))
+
+    return b"\n\n".join(blocks) + b"\n" if blocks else b""
+
+
+def _grep_file(regex: re.Pattern, file_path: str) -> list[bytes]:
+    """Find the lines of one file matching regex, as "line:text" entries."""
+    try:
+        with open(file_path, "rb") as f:
+            # Binary files are skipped, as rg does
+            if b"\0" in f.read(GREP_BINARY_SNIFF):
+                return []
+
+            size = os.fstat(f.fileno()).st_size
+            if size > GREP_MMAP_THRESHOLD:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    return _match_lines(regex, mapped)
+
+            f.seek(0)
+            return _match_lines(regex, f.read())
+    except OSError:
+        return []
+
+
+def _match_lines(regex: re.Pattern, data) -> list[bytes]:
+    """Collect the matching lines of a buffer, one entry per line."""
+    lines = []
+    line_number = 1
+    counted_to = 0
+    pos = 0
+
+    while len(lines) < GREP_MAX_COUNT and (match := regex.search(data, pos)):
+        start = data.rfind(b"\n", 0, match.start()) + 1
+        end = data.find(b"\n", match.start())
+        if end == -1:
+            end = len(data)
+
+        line_number += data[counted_to:start].count(b"\n")
+        counted_to = start
+
+        text = data[start:end][:GREP_MAX_COLUMNS]
+        lines.append(b"%d:%s" % (line_number, text))
+
+        # Continue after this line so each line is reported once
+        pos = end + 1
+        if pos > len(data):
+            break
+
+    return lines
+
+
+async def _run_command(args: list[str], timeout: float = 30) -> tuple[int, bytes, bytes]:
+    """Run a command without blocking the event loop and capture its output."""
+    process = await asyncio.create_subprocess_exec(
+        *args,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except TimeoutError:
+        process.kill()
+        await process.wait()
+        raise
+
+    return process.returncode, stdout, stderr
+
+
+def _decode_output(output: bytes) -> str:
+    """Decode command output, truncated at a line boundary to MAX_GREP_OUTPUT."""
+    if len(output) <= MAX_GREP_OUTPUT:
+        return output.decode("utf-8", "replace")
+
+    end = output.rfind(b"\n", 0, MAX_GREP_OUTPUT) + 1 or MAX_GREP_OUTPUT
+    text = output[:end].decode("utf-8", "replace")
+    return f"{text}\n[Output truncated at {MAX_GREP_OUTPUT} bytes]"
@@ -0,0 +1,30 @@
+"""
+Shared fixtures for the test suite.
+"""
+
+import asyncio
+
+import pytest
+import pytest_asyncio
+
+from mcp_server.server import list_tools
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+
+@pytest.fixture(scope="session")
+def event_loop_policy():
+    """Run async tests on uvloop when it is installed."""
+    if uvloop is None:
+        return asyncio.DefaultEventLoopPolicy()
+    return uvloop.EventLoopPolicy()
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def all_tools():
+    """The registered tool list, built once for the whole session."""
+    return await list_tools()
+
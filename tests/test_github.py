@@ -4,6 +4,8 @@ Tests for the GitHub tool.
 
 import os
 import base64
+import asyncio
+import httpx
 import pytest
 from pytest_httpx import HTTPXMock
 
@@ -11,8 +13,42 @@ from mcp_server.tools.github import (
     get_pr_diff,
     search_github_files,
     read_github_file,
+    read_github_files,
     grep_github_repo,
+    close_client,
+    _get_client,
+    _new_client,
+    _etag_cache,
+    _file_cache,
+    _search_cache,
+    _get_github_headers,
+    _BUCKETS,
 )
+from mcp_server.tools._rate_limit import TokenBucket
+
+# Contents API payloads, encoded once at import
+_HELLO = "print('Hello, World!')\n"
+_HELLO_B64 = base64.b64encode(_HELLO.encode()).decode()
+_CACHED_B64 = base64.b64encode(b"cached").decode()
+_TEST_B64 = base64.b64encode(b"test").decode()
+
+
+@pytest.fixture(autouse=True)
+def clear_caches(monkeypatch):
+    """Start every test without cached GitHub responses and with full request budgets."""
+    monkeypatch.setattr(
+        "mcp_server.tools.github._BUCKETS",
+        {name: TokenBucket(bucket.rate, bucket.capacity) for name, bucket in _BUCKETS.items()},
+    )
+    _etag_cache.clear()
+    _file_cache.clear()
+    _search_cache.clear()
+    _get_github_headers.cache_clear()
+    yield
+    _etag_cache.clear()
+    _file_cache.clear()
+    _search_cache.clear()
+    _get_github_headers.cache_clear()
 
 
 @pytest.mark.asyncio
@@ -75,16 +111,14 @@ async def test_get_pr_diff_with_token(httpx_mock: HTTPXMock, monkeypatch):
     # Set environment variable
     monkeypatch.setenv("GITHUB_TOKEN", test_token)
 
-    def check_auth(request):
-        assert "Authorization" in request.headers
-        assert f"Bearer {test_token}" in request.headers["Authorization"]
-        return True
-
     httpx_mock.add_response(
         url="https://api.github.com/repos/owner/repo/pulls/123",
         text=mock_diff,
         status_code=200,
-        match_headers={"Accept": "application/vnd.github.v3.diff"},
+        match_headers={
+            "Accept": "application/vnd.github.v3.diff",
+            "Authorization": f"Bearer {test_token}",
+        },
     )
 
     result = await get_pr_diff("owner/repo", 123)
@@ -92,6 +126,46 @@ async def test_get_pr_diff_with_token(httpx_mock: HTTPXMock, monkeypatch):
     assert result == mock_diff
 
 
+@pytest.mark.asyncio
+async def test_get_pr_diff_retries_server_error(httpx_mock: HTTPXMock):
+    """Test that transient server errors are retried, honoring Retry-After."""
+    url = "https://api.github.com/repos/owner/repo/pulls/123"
+    httpx_mock.add_response(url=url, status_code=503, headers={"Retry-After": "0"})
+    httpx_mock.add_response(url=url, text="diff after retry", status_code=200)
+
+    result = await get_pr_diff("owner/repo", 123)
+
+    assert result == "diff after retry"
+
+
+@pytest.mark.asyncio
+async def test_get_pr_diff_retries_network_error(httpx_mock: HTTPXMock, monkeypatch):
+    """Test that network failures are retried with backoff."""
+    monkeypatch.setattr("mcp_server.tools.github.RETRY_BASE_DELAY", 0)
+
+    url = "https://api.github.com/repos/owner/repo/pulls/123"
+    httpx_mock.add_exception(httpx.ConnectError("Connection refused"), url=url)
+    httpx_mock.add_response(url=url, text="diff after retry", status_code=200)
+
+    result = await get_pr_diff("owner/repo", 123)
+
+    assert result == "diff after retry"
+
+
+@pytest.mark.asyncio
+async def test_get_pr_diff_gives_up_after_max_retries(httpx_mock: HTTPXMock, monkeypatch):
+    """Test that retries stop after MAX_RETRIES and the last status is reported."""
+    monkeypatch.setattr("mcp_server.tools.github.MAX_RETRIES", 1)
+
+    url = "https://api.github.com/repos/owner/repo/pulls/123"
+    httpx_mock.add_response(url=url, status_code=502, headers={"Retry-After": "0"})
+    httpx_mock.add_response(url=url, status_code=502, headers={"Retry-After": "0"})
+
+    result = await get_pr_diff("owner/repo", 123)
+
+    assert "status 502" in result
+
+
 @pytest.mark.asyncio
 async def test_get_pr_diff_timeout(httpx_mock: HTTPXMock):
     """Test handling of timeout errors."""
@@ -120,6 +194,146 @@ async def test_get_pr_diff_correct_headers(httpx_mock: HTTPXMock):
     assert request.headers["Accept"] == "application/vnd.github.v3.diff"
 
 
+@pytest.mark.asyncio
+async def test_get_pr_diff_revalidates_with_etag(httpx_mock: HTTPXMock):
+    """Test that a 304 response returns the previously fetched diff."""
+    url = "https://api.github.com/repos/owner/repo/pulls/7"
+    httpx_mock.add_response(
+        url=url,
+        text="cached diff",
+        headers={"ETag": '"abc123"'},
+        status_code=200,
+    )
+    httpx_mock.add_response(
+        url=url,
+        status_code=304,
+        match_headers={"If-None-Match": '"abc123"'},
+    )
+
+    first = await get_pr_diff("owner/repo", 7)
+    second = await get_pr_diff("owner/repo", 7)
+
+    assert first == "cached diff"
+    assert second == "cached diff"
+
+
+@pytest.mark.asyncio
+async def test_etag_cache_skips_large_bodies(httpx_mock: HTTPXMock, monkeypatch):
+    """Test that bodies over the per-entry limit are not kept for revalidation."""
+    monkeypatch.setattr("mcp_server.tools.github.CACHE_MAX_ENTRY_BYTES", 10)
+
+    httpx_mock.add_response(
+        url="https://api.github.com/repos/owner/repo/pulls/1",
+        text="small",
+        headers={"ETag": '"small"'},
+        status_code=200,
+    )
+    httpx_mock.add_response(
+        url="https://api.github.com/repos/owner/repo/pulls/2",
+        text="x" * 11,
+        headers={"ETag": '"large"'},
+        status_code=200,
+    )
+
+    await get_pr_diff("owner/repo", 1)
+    await get_pr_diff("owner/repo", 2)
+
+    assert list(_etag_cache) == ["https://api.github.com/repos/owner/repo/pulls/1"]
+    assert _etag_cache.currsize == len("small")
+
+
+@pytest.mark.asyncio
+async def test_get_pr_diff_too_large(httpx_mock: HTTPXMock, monkeypatch):
+    """Test that diffs over the size limit are rejected."""
+    monkeypatch.setattr("mcp_server.tools.github.MAX_DIFF_BYTES", 10)
+
+    httpx_mock.add_response(
+        url="https://api.github.com/repos/owner/repo/pulls/123",
+        text="x" * 100,
+        status_code=200,
+    )
+
+    result = await get_pr_diff("owner/repo", 123)
+
+    assert "larger than 10 bytes" in result
+
+
+@pytest.mark.asyncio
+async def test_get_pr_diff_too_large_by_content_length(httpx_mock: HTTPXMock, monkeypatch):
+    """Test that a declared Content-Length over the limit is rejected unread."""
+    monkeypatch.setattr("mcp_server.tools.github.MAX_DIFF_BYTES", 10)
+
+    async def fail_on_read(self, chunk_size=None):
+        raise AssertionError("body should not be read")
+        yield b""
+
+    monkeypatch.setattr(httpx.Response, "aiter_bytes", fail_on_read)
+
+    httpx_mock.add_response(
+        url="https://api.github.com/repos/owner/repo/pulls/123",
+        text="x" * 100,
+        status_code=200,
+    )
+
+    result = await get_pr_diff("owner/repo", 123)
+
+    assert "larger than 10 bytes" in result
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("repo", ["owner", "owner/repo/extra", "owner/re po", "../repo", "owner/.."])
+async def test_invalid_repo_rejected(httpx_mock: HTTPXMock, repo):
+    """Test that malformed repositories are rejected without a request."""
+    results = [
+        await get_pr_diff(repo, 1),
+        await search_github_files(repo, "main.py"),
+        await read_github_file(repo, "main.py"),
+        await read_github_files(repo, ["main.py"]),
+        await grep_github_repo(repo, "test"),
+    ]
+
+    for result in results:
+        assert result.startswith("Error: Invalid repository")
+    assert httpx_mock.get_requests() == []
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("pr_number", [0, -1, True, 1.5, "1", "../../../../user"])
+async def test_invalid_pr_number_rejected(httpx_mock: HTTPXMock, pr_number):
+    """Test that PR numbers other than positive integers are rejected without a request."""
+    result = await get_pr_diff("owner/repo", pr_number)
+
+    assert result.startswith("Error: Invalid PR number")
+    assert httpx_mock.get_requests() == []
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "file_path",
+    ["", "../../../user", "src/../../x", "./main.py", "src//main.py", "/etc/passwd", "src/", "a\x00b"],
+)
+async def test_invalid_file_path_rejected(httpx_mock: HTTPXMock, file_path):
+    """Test that paths able to leave the contents endpoint are rejected without a request."""
+    single = await read_github_file("owner/repo", file_path)
+    batch = await read_github_files("owner/repo", ["ok.py", file_path])
+
+    assert single.startswith("Error: Invalid file path")
+    assert batch.startswith("Error: Invalid file path")
+    assert httpx_mock.get_requests() == []
+
+
+@pytest.mark.asyncio
+async def test_read_github_file_escapes_path(httpx_mock: HTTPXMock):
+    """Test that query and fragment characters in a path stay in the path."""
+    httpx_mock.add_response(text="ok", status_code=200)
+
+    await read_github_file("owner/repo", "docs/a?b#c%2e.md")
+
+    request = httpx_mock.get_request()
+    assert request.url.path == "/repos/owner/repo/contents/docs/a?b#c%2e.md"
+    assert dict(request.url.params) == {"ref": "main"}
+
+
 # Tests for search_github_files
 
 
@@ -176,8 +390,36 @@ async def test_search_github_files_with_path(httpx_mock: HTTPXMock):
     result = await search_github_files("owner/repo", "test.py", path="src/")
 
     request = httpx_mock.get_request()
-    # Check for URL-encoded version: path:src/ becomes path%3Asrc%2F
-    assert "path%3Asrc%2F" in str(request.url) or "path:src/" in str(request.url)
+    assert request.url.params["q"] == "repo:owner/repo filename:test.py path:src/"
+
+
+@pytest.mark.asyncio
+async def test_search_github_files_cached(httpx_mock: HTTPXMock):
+    """Test that repeating a search is served from the cache."""
+    httpx_mock.add_response(
+        json={"total_count": 1, "items": [{"path": "src/main.py", "html_url": "url"}]},
+        status_code=200,
+    )
+
+    first = await search_github_files("owner/repo", "main.py")
+    second = await search_github_files("owner/repo", "main.py")
+
+    assert first == second
+    assert "src/main.py" in first
+    assert len(httpx_mock.get_requests()) == 1
+
+
+@pytest.mark.asyncio
+async def test_search_github_files_errors_not_cached(httpx_mock: HTTPXMock):
+    """Test that failed searches are retried on the next call."""
+    httpx_mock.add_response(status_code=422)
+    httpx_mock.add_response(json={"total_count": 0, "items": []}, status_code=200)
+
+    first = await search_github_files("owner/repo", "main.py")
+    second = await search_github_files("owner/repo", "main.py")
+
+    assert "Error" in first
+    assert "No files found" in second
 
 
 # Tests for read_github_file
@@ -186,12 +428,9 @@ async def test_search_github_files_with_path(httpx_mock: HTTPXMock):
 @pytest.mark.asyncio
 async def test_read_github_file_success(httpx_mock: HTTPXMock):
     """Test successfully reading a file from GitHub."""
-    file_content = "print('Hello, World!')\n"
-    content_base64 = base64.b64encode(file_content.encode()).decode()
-
     mock_response = {
         "type": "file",
-        "content": content_base64,
+        "content": _HELLO_B64,
         "encoding": "base64",
     }
 
@@ -202,7 +441,54 @@ async def test_read_github_file_success(httpx_mock: HTTPXMock):
 
     result = await read_github_file("owner/repo", "main.py")
 
-    assert result == file_content
+    assert result == _HELLO
+
+
+@pytest.mark.asyncio
+async def test_read_github_file_raw(httpx_mock: HTTPXMock):
+    """Test reading a file returned in the raw media type."""
+    httpx_mock.add_response(
+        text="print('raw')\n",
+        headers={"Content-Type": "application/vnd.github.raw; charset=utf-8"},
+        status_code=200,
+        match_headers={"Accept": "application/vnd.github.raw"},
+    )
+
+    result = await read_github_file("owner/repo", "raw.py")
+
+    assert result == "print('raw')\n"
+
+
+@pytest.mark.asyncio
+async def test_read_github_file_too_large(httpx_mock: HTTPXMock, monkeypatch):
+    """Test that files above the size cap are rejected."""
+    monkeypatch.setattr("mcp_server.tools.github.MAX_FILE_BYTES", 10)
+
+    httpx_mock.add_response(
+        text="x" * 11,
+        headers={"Content-Type": "application/vnd.github.raw"},
+        status_code=200,
+    )
+
+    result = await read_github_file("owner/repo", "big.txt")
+
+    assert "Error" in result
+    assert "larger than 10 bytes" in result
+
+
+@pytest.mark.asyncio
+async def test_read_github_file_cached(httpx_mock: HTTPXMock):
+    """Test that reading the same file again is served from the cache."""
+    httpx_mock.add_response(
+        json={"type": "file", "content": _CACHED_B64},
+        status_code=200,
+    )
+
+    first = await read_github_file("owner/repo", "cached.py")
+    second = await read_github_file("owner/repo", "cached.py")
+
+    assert first == second == "cached"
+    assert len(httpx_mock.get_requests()) == 1
 
 
 @pytest.mark.asyncio
@@ -233,17 +519,40 @@ async def test_read_github_file_is_directory(httpx_mock: HTTPXMock):
 @pytest.mark.asyncio
 async def test_read_github_file_custom_branch(httpx_mock: HTTPXMock):
     """Test reading from a specific branch."""
-    content_base64 = base64.b64encode(b"test").decode()
-
     httpx_mock.add_response(
-        json={"type": "file", "content": content_base64},
+        json={"type": "file", "content": _TEST_B64},
         status_code=200,
     )
 
     result = await read_github_file("owner/repo", "file.py", branch="develop")
 
     request = httpx_mock.get_request()
-    assert "ref=develop" in str(request.url)
+    assert request.url.params["ref"] == "develop"
+
+
+# Tests for read_github_files
+
+
+@pytest.mark.asyncio
+async def test_read_github_files_reads_each_path(httpx_mock: HTTPXMock):
+    """Test reading several files returns each one under its path."""
+    for name in ("a.py", "b.py"):
+        httpx_mock.add_response(
+            url=f"https://api.github.com/repos/owner/repo/contents/{name}?ref=main",
+            text=f"# {name}\n",
+            headers={"Content-Type": "application/vnd.github.raw"},
+            status_code=200,
+        )
+    httpx_mock.add_response(
+        url="https://api.github.com/repos/owner/repo/contents/missing.py?ref=main",
+        status_code=404,
+    )
+
+    result = await read_github_files("owner/repo", ["a.py", "b.py", "missing.py"])
+
+    assert "=== a.py ===\n# a.py" in result
+    assert "=== b.py ===\n# b.py" in result
+    assert "=== missing.py ===\nError: File not found" in result
 
 
 # Tests for grep_github_repo
@@ -285,6 +594,20 @@ async def test_grep_github_repo_no_matches(httpx_mock: HTTPXMock):
     assert "No matches found" in result
 
 
+@pytest.mark.asyncio
+async def test_grep_github_repo_retries_secondary_rate_limit(httpx_mock: HTTPXMock):
+    """Test that a 403 carrying Retry-After is treated as a rate limit and retried."""
+    httpx_mock.add_response(status_code=403, headers={"Retry-After": "0"})
+    httpx_mock.add_response(
+        json={"total_count": 1, "items": [{"path": "src/a.py", "html_url": "url"}]},
+        status_code=200,
+    )
+
+    result = await grep_github_repo("owner/repo", "retry")
+
+    assert "src/a.py" in result
+
+
 @pytest.mark.asyncio
 async def test_grep_github_repo_rate_limit(httpx_mock: HTTPXMock):
     """Test handling rate limit errors."""
@@ -295,3 +618,90 @@ async def test_grep_github_repo_rate_limit(httpx_mock: HTTPXMock):
     result = await grep_github_repo("owner/repo", "test")
 
     assert "rate limit" in result.lower() or "authentication" in result.lower()
+
+
+# Tests for the shared HTTP client
+
+
+@pytest.mark.asyncio
+async def test_client_is_shared_between_calls():
+    """Test that the HTTP client is reused until it is closed."""
+    client = await _get_client()
+
+    assert await _get_client() is client
+
+    await close_client()
+
+    assert client.is_closed
+    assert await _get_client() is not client
+
+
+def test_client_is_recreated_for_a_new_event_loop():
+    """Test that a client is never reused on a different event loop."""
+    first = asyncio.run(_get_client())
+    second = asyncio.run(_get_client())
+
+    assert first is not second
+
+
+def test_client_falls_back_without_http2(monkeypatch):
+    """Test that a client is still created when the h2 package is missing."""
+    real_client = httpx.AsyncClient
+    calls = []
+
+    def fake_client(**kwargs):
+        calls.append(kwargs.get("http2", False))
+        if kwargs.get("http2"):
+            raise ImportError("Using http2=True, but the 'h2' package is not installed.")
+        return real_client(**kwargs)
+
+    monkeypatch.setattr(httpx, "AsyncClient", fake_client)
+
+    client = _new_client()
+
+    assert isinstance(client, real_client)
+    assert calls == [True, False]
+
+
+# Tests for request rate limiting
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_waits_once_burst_is_spent(monkeypatch):
+    """Test that requests beyond the burst capacity wait for refilled tokens."""
+    delays = []
+
+    async def fake_sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr("mcp_server.tools._rate_limit.time.monotonic", lambda: 100.0)
+    monkeypatch.setattr("mcp_server.tools._rate_limit.asyncio.sleep", fake_sleep)
+
+    bucket = TokenBucket(rate=2, capacity=2)
+    for _ in range(4):
+        await bucket.acquire()
+
+    assert delays == [0.5, 1.0]
+
+
+@pytest.mark.asyncio
+async def test_search_requests_use_search_budget(httpx_mock: HTTPXMock, monkeypatch):
+    """Test that code searches draw from the search budget, not the core one."""
+    acquired = []
+
+    class RecordingBucket:
+        def __init__(self, name):
+            self.name = name
+
+        async def acquire(self):
+            acquired.append(self.name)
+
+    monkeypatch.setattr(
+        "mcp_server.tools.github._BUCKETS",
+        {"search": RecordingBucket("search"), "core": RecordingBucket("core")},
+    )
+    httpx_mock.add_response(json={"total_count": 0, "items": []}, status_code=200)
+
+    await grep_github_repo("owner/repo", "test")
+
+    assert acquired == ["search"]
@@ -3,7 +3,6 @@ Tests for the read tool.
 """
 
 import os
-import tempfile
 from pathlib import Path
 import pytest
 
@@ -11,73 +10,122 @@ from mcp_server.tools.read import read_file, _is_sensitive_file
 
 
 @pytest.mark.asyncio
-async def test_read_file_success():
+async def test_read_file_success(tmp_path):
     """Test successfully reading a file."""
-    with tempfile.TemporaryDirectory() as tmpdir:
-        test_file = Path(tmpdir, "test.txt")
-        test_content = "Hello, World!\nThis is a test file."
-        test_file.write_text(test_content)
+    test_file = Path(tmp_path, "test.txt")
+    test_content = "Hello, World!\nThis is a test file."
+    test_file.write_text(test_content)
 
-        result = await read_file(str(test_file), tmpdir)
+    result = await read_file(str(test_file), str(tmp_path))
 
-        assert result == test_content
+    assert result == test_content
 
 
 @pytest.mark.asyncio
-async def test_read_file_not_found():
+async def test_read_file_large(monkeypatch, tmp_path):
+    """Test reading a file above the memory-map threshold."""
+    monkeypatch.setattr("mcp_server.tools.read.MMAP_THRESHOLD", 16)
+
+    test_file = Path(tmp_path, "large.txt")
+    test_content = "héllo wörld\n" * 100
+    test_file.write_text(test_content, encoding="utf-8")
+
+    result = await read_file(str(test_file), str(tmp_path))
+
+    assert result == test_content
+
+
+@pytest.mark.asyncio
+async def test_read_file_too_large(monkeypatch, tmp_path):
+    """Test that files above the size cap are rejected."""
+    monkeypatch.setattr("mcp_server.tools.read.MAX_FILE_BYTES", 16)
+
+    test_file = Path(tmp_path, "big.txt")
+    test_file.write_text("x" * 17)
+
+    result = await read_file(str(test_file), str(tmp_path))
+
+    assert "Error" in result
+    assert "larger than 16 bytes" in result
+
+
+@pytest.mark.asyncio
+async def test_read_file_not_found(tmp_path):
     """Test reading a non-existent file."""
-    with tempfile.TemporaryDirectory() as tmpdir:
-        result = await read_file(
-            os.path.join(tmpdir, "nonexistent.txt"),
-            tmpdir
-        )
+    result = await read_file(
+        os.path.join(str(tmp_path), "nonexistent.txt"),
+        str(tmp_path)
+    )
 
-        assert "File not found" in result
+    assert "File not found" in result
 
 
 @pytest.mark.asyncio
-async def test_read_file_path_traversal_protection():
+async def test_read_file_path_traversal_protection(tmp_path):
     """Test that path traversal attempts are blocked."""
-    with tempfile.TemporaryDirectory() as tmpdir:
-        # Try to read a file outside the allowed directory
-        result = await read_file("/etc/passwd", tmpdir)
+    # Try to read a file outside the allowed directory
+    result = await read_file("/etc/passwd", str(tmp_path))
 
-        assert "Access denied" in result or "outside allowed directory" in result
+    assert "Access denied" in result or "outside allowed directory" in result
 
 
 @pytest.mark.asyncio
-async def test_read_file_relative_path_traversal():
+async def test_read_file_relative_path_traversal(tmp_path):
     """Test that relative path traversal is blocked."""
-    with tempfile.TemporaryDirectory() as tmpdir:
-        # Try to use .. to escape the directory
-        result = await read_file("../../etc/passwd", tmpdir)
+    # Try to use .. to escape the directory
+    result = await read_file("../../etc/passwd", str(tmp_path))
 
-        assert "Access denied" in result or "outside allowed directory" in result
+    assert "Access denied" in result or "outside allowed directory" in result
 
 
 @pytest.mark.asyncio
-async def test_read_sensitive_file_blocked():
+async def test_read_file_sibling_prefix_blocked(tmp_path):
+    """Test that a sibling directory sharing the root's name prefix is blocked."""
+    root = Path(tmp_path, "app")
+    sibling = Path(tmp_path, "app-secrets")
+    root.mkdir()
+    sibling.mkdir()
+    Path(sibling, "notes.txt").write_text("outside")
+
+    result = await read_file(str(Path(sibling, "notes.txt")), str(root))
+
+    assert "Access denied" in result
+
+
+@pytest.mark.asyncio
+async def test_read_file_symlink_escape_blocked(tmp_path):
+    """Test that symlinks pointing outside the root are blocked."""
+    root = Path(tmp_path, "app")
+    root.mkdir()
+    Path(tmp_path, "outside.txt").write_text("outside")
+    Path(root, "link.txt").symlink_to(Path(tmp_path, "outside.txt"))
+
+    result = await read_file(str(Path(root, "link.txt")), str(root))
+
+    assert "Access denied" in result
+
+
+@pytest.mark.asyncio
+async def test_read_sensitive_file_blocked(tmp_path):
     """Test that sensitive files cannot be read."""
-    with tempfile.TemporaryDirectory() as tmpdir:
-        env_file = Path(tmpdir, ".env")
-        env_file.write_text("SECRET_KEY=abc123")
+    env_file = Path(tmp_path, ".env")
+    env_file.write_text("SECRET_KEY=abc123")
 
-        result = await read_file(str(env_file), tmpdir)
+    result = await read_file(str(env_file), str(tmp_path))
 
-        assert "Cannot read sensitive file" in result or "sensitive" in result.lower()
+    assert "Cannot read sensitive file" in result or "sensitive" in result.lower()
 
 
 @pytest.mark.asyncio
-async def test_read_file_binary_error():
+async def test_read_file_binary_error(tmp_path):
     """Test handling of binary/non-text files."""
-    with tempfile.TemporaryDirectory() as tmpdir:
-        binary_file = Path(tmpdir, "test.bin")
-        binary_file.write_bytes(b'\x00\x01\x02\x03\xff\xfe')
+    binary_file = Path(tmp_path, "test.bin")
+    binary_file.write_bytes(b'\x00\x01\x02\x03\xff\xfe')
 
-        result = await read_file(str(binary_file), tmpdir)
+    result = await read_file(str(binary_file), str(tmp_path))
 
-        # Should handle encoding error gracefully
-        assert "Error" in result or result == ""
+    # Should handle encoding error gracefully
+    assert "Error" in result or result == ""
 
 
 def test_is_sensitive_file_env():
@@ -100,6 +148,13 @@ def test_is_sensitive_file_credentials():
     assert _is_sensitive_file(Path("secrets.yaml"))
 
 
+def test_is_sensitive_file_case_and_str_paths():
+    """Test detection ignores case and accepts plain string paths."""
+    assert _is_sensitive_file("config/.ENV")
+    assert _is_sensitive_file("/home/user/.ssh/ID_RSA")
+    assert not _is_sensitive_file("src/environment.py")
+
+
 def test_is_sensitive_file_normal_files():
     """Test that normal files are not flagged."""
     assert not _is_sensitive_file(Path("README.md"))
@@ -3,73 +3,142 @@ Tests for the search tool.
 """
 
 import os
-import tempfile
 from pathlib import Path
 import pytest
 
-from mcp_server.tools.search import search_files, _is_sensitive_file
+from mcp_server.tools.search import (
+    search_files,
+    _is_sensitive_file,
+    _run_command,
+    _decode_output,
+    _grep_files,
+)
 
 
 @pytest.mark.asyncio
-async def test_search_by_glob_finds_files():
+async def test_search_by_glob_finds_files(tmp_path):
     """Test that glob search finds matching files."""
-    with tempfile.TemporaryDirectory() as tmpdir:
-        # Create test files
-        Path(tmpdir, "test1.py").touch()
-        Path(tmpdir, "test2.py").touch()
-        Path(tmpdir, "other.txt").touch()
+    # Create test files
+    Path(tmp_path, "test1.py").touch()
+    Path(tmp_path, "test2.py").touch()
+    Path(tmp_path, "other.txt").touch()
 
-        result = await search_files("*.py", "glob", tmpdir)
+    result = await search_files("*.py", "glob", str(tmp_path))
 
-        assert "test1.py" in result
-        assert "test2.py" in result
-        assert "other.txt" not in result
+    assert "test1.py" in result
+    assert "test2.py" in result
+    assert "other.txt" not in result
 
 
 @pytest.mark.asyncio
-async def test_search_by_glob_no_matches():
+async def test_search_by_glob_no_matches(tmp_path):
     """Test glob search with no matches."""
-    with tempfile.TemporaryDirectory() as tmpdir:
-        Path(tmpdir, "test.txt").touch()
+    Path(tmp_path, "test.txt").touch()
 
-        result = await search_files("*.py", "glob", tmpdir)
+    result = await search_files("*.py", "glob", str(tmp_path))
 
-        assert "No files found" in result
+    assert "No files found" in result
 
 
 @pytest.mark.asyncio
-async def test_search_by_glob_filters_sensitive_files():
+async def test_search_by_glob_filters_sensitive_files(tmp_path):
     """Test that sensitive files are filtered from glob results."""
-    with tempfile.TemporaryDirectory() as tmpdir:
-        # Create normal and sensitive files
-        Path(tmpdir, "config.py").touch()
-        Path(tmpdir, ".env").touch()
-        Path(tmpdir, "credentials.txt").touch()
+    # Create normal and sensitive files
+    Path(tmp_path, "config.py").touch()
+    Path(tmp_path, ".env").touch()
+    Path(tmp_path, "credentials.txt").touch()
 
-        result = await search_files("*", "glob", tmpdir)
+    result = await search_files("*", "glob", str(tmp_path))
 
-        assert "config.py" in result
-        assert ".env" not in result
-        assert "credentials" not in result
+    assert "config.py" in result
+    assert ".env" not in result
+    assert "credentials" not in result
 
 
 @pytest.mark.asyncio
-async def test_search_by_grep_finds_content():
+async def test_search_by_glob_matches_nested_paths(tmp_path):
+    """Test that glob search descends into subdirectories and skips pruned ones."""
+    Path(tmp_path, "src", "pkg").mkdir(parents=True)
+    Path(tmp_path, "node_modules").mkdir()
+    Path(tmp_path, "src", "pkg", "module.py").touch()
+    Path(tmp_path, "node_modules", "vendored.py").touch()
+    Path(tmp_path, "top.py").touch()
+
+    by_name = await search_files("*.py", "glob", str(tmp_path))
+    by_path = await search_files("src/**/*.py", "glob", str(tmp_path))
+
+    assert "module.py" in by_name
+    assert "top.py" in by_name
+    assert "vendored.py" not in by_name
+    assert "module.py" in by_path
+    assert "top.py" not in by_path
+
+
+@pytest.mark.asyncio
+async def test_search_by_glob_stops_at_limit(monkeypatch, tmp_path):
+    """Test that glob search stops once the result limit is reached."""
+    monkeypatch.setattr("mcp_server.tools.search.MAX_GLOB_RESULTS", 3)
+
+    for i in range(10):
+        Path(tmp_path, f"file{i}.py").touch()
+
+    result = await search_files("*.py", "glob", str(tmp_path))
+
+    assert "Found 3 files (stopped at 3)" in result
+    assert result.count(".py") == 3
+
+
+@pytest.mark.asyncio
+async def test_search_by_grep_finds_content(tmp_path):
     """Test that grep search finds file content."""
-    with tempfile.TemporaryDirectory() as tmpdir:
-        # Create test file with content
-        test_file = Path(tmpdir, "test.py")
-        test_file.write_text("def hello():\n    print('Hello, World!')\n")
+    # Create test file with content
+    test_file = Path(tmp_path, "test.py")
+    test_file.write_text("def hello():\n    print('Hello, World!')\n")
+
+    result = await search_files("hello", "grep", str(tmp_path))
+
+    # Should find the match (either via rg or git grep) or return error
+    # Note: git grep requires a git repo, rg may not be installed
+    assert (
+        "hello" in result.lower()
+        or "no matches found" in result.lower()
+        or "error" in result.lower()  # Accept error if tools not available
+    )
 
-        result = await search_files("hello", "grep", tmpdir)
 
-        # Should find the match (either via rg or git grep) or return error
-        # Note: git grep requires a git repo, rg may not be installed
-        assert (
-            "hello" in result.lower()
-            or "no matches found" in result.lower()
-            or "error" in result.lower()  # Accept error if tools not available
-        )
+def test_grep_files_reports_matching_lines(monkeypatch, tmp_path):
+    """Test the in-process grep reports line numbers and skips binary and sensitive files."""
+    monkeypatch.setattr("mcp_server.tools.search.GREP_MMAP_THRESHOLD", 16)
+
+    Path(tmp_path, "small.py").write_text("a = 1\ndef hello():\n    hello()\n")
+    Path(tmp_path, "large.py").write_text("x = 0\n" * 10 + "hello = 2\n")
+    Path(tmp_path, "data.bin").write_bytes(b"hello\0world")
+    Path(tmp_path, ".env").write_text("hello=secret\n")
+
+    result = _grep_files("hel+o", str(tmp_path)).decode()
+
+    assert "small.py\n2:def hello():\n3:    hello()" in result
+    assert "large.py\n11:hello = 2" in result
+    assert "data.bin" not in result
+    assert ".env" not in result
+
+
+@pytest.mark.asyncio
+async def test_run_command_times_out():
+    """Test that slow subprocesses are killed after the timeout."""
+    with pytest.raises(TimeoutError):
+        await _run_command(["sleep", "5"], timeout=0.1)
+
+
+def test_decode_output_truncates_at_line(monkeypatch):
+    """Test that long grep output is cut at a line boundary."""
+    monkeypatch.setattr("mcp_server.tools.search.MAX_GREP_OUTPUT", 10)
+
+    result = _decode_output(b"a.py:1:x\nb.py:2:y\nc.py:3:z\n")
+
+    assert result.startswith("a.py:1:x\n")
+    assert "b.py" not in result
+    assert "truncated" in result
 
 
 @pytest.mark.asyncio
@@ -93,6 +162,12 @@ def test_is_sensitive_file_detects_credentials():
     assert _is_sensitive_file(Path("private_key.pem"))
 
 
+def test_is_sensitive_file_detects_ssh_keys():
+    """Test that search filters the same key files that read blocks."""
+    assert _is_sensitive_file(Path("id_rsa"))
+    assert _is_sensitive_file(Path("id_dsa.pub"))
+
+
 def test_is_sensitive_file_allows_normal():
     """Test that normal files are not flagged as sensitive."""
     assert not _is_sensitive_file(Path("config.py"))
@@ -3,31 +3,31 @@ Tests for the main MCP server.
 """
 
 import pytest
-from mcp_server.server import app, list_tools, call_tool
+from pytest_httpx import HTTPXMock
+
+from mcp_server.server import app, call_tool
 
 
 @pytest.mark.asyncio
-async def test_list_tools():
+async def test_list_tools(all_tools):
     """Test that all expected tools are registered."""
-    tools = await list_tools()
-
-    assert len(tools) == 6, "Expected 6 tools to be registered"
+    assert len(all_tools) == 8, "Expected 8 tools to be registered"
 
-    tool_names = [tool.name for tool in tools]
+    tool_names = [tool.name for tool in all_tools]
     assert "search_files" in tool_names
     assert "read_file" in tool_names
     assert "get_pr_diff" in tool_names
     assert "search_github_files" in tool_names
     assert "read_github_file" in tool_names
+    assert "read_github_files" in tool_names
     assert "grep_github_repo" in tool_names
+    assert "batch_github" in tool_names
 
 
 @pytest.mark.asyncio
-async def test_list_tools_schemas():
+async def test_list_tools_schemas(all_tools):
     """Test that all tools have proper input schemas."""
-    tools = await list_tools()
-
-    for tool in tools:
+    for tool in all_tools:
         assert tool.name, "Tool must have a name"
         assert tool.description, "Tool must have a description"
         assert tool.inputSchema, "Tool must have an input schema"
@@ -37,10 +37,9 @@ async def test_list_tools_schemas():
 
 
 @pytest.mark.asyncio
-async def test_search_files_tool_schema():
+async def test_search_files_tool_schema(all_tools):
     """Test search_files tool has correct schema."""
-    tools = await list_tools()
-    search_tool = next(t for t in tools if t.name == "search_files")
+    search_tool = next(t for t in all_tools if t.name == "search_files")
 
     props = search_tool.inputSchema["properties"]
     assert "query" in props
@@ -53,10 +52,9 @@ async def test_search_files_tool_schema():
 
 
 @pytest.mark.asyncio
-async def test_read_file_tool_schema():
+async def test_read_file_tool_schema(all_tools):
     """Test read_file tool has correct schema."""
-    tools = await list_tools()
-    read_tool = next(t for t in tools if t.name == "read_file")
+    read_tool = next(t for t in all_tools if t.name == "read_file")
 
     props = read_tool.inputSchema["properties"]
     assert "file_path" in props
@@ -66,10 +64,9 @@ async def test_read_file_tool_schema():
 
 
 @pytest.mark.asyncio
-async def test_get_pr_diff_tool_schema():
+async def test_get_pr_diff_tool_schema(all_tools):
     """Test get_pr_diff tool has correct schema."""
-    tools = await list_tools()
-    pr_tool = next(t for t in tools if t.name == "get_pr_diff")
+    pr_tool = next(t for t in all_tools if t.name == "get_pr_diff")
 
     props = pr_tool.inputSchema["properties"]
     assert "repo" in props
@@ -85,3 +82,62 @@ async def test_call_unknown_tool():
     """Test that calling an unknown tool raises an error."""
     with pytest.raises(ValueError, match="Unknown tool"):
         await call_tool("nonexistent_tool", {})
+
+
+@pytest.mark.asyncio
+async def test_batch_github_returns_result_per_request(httpx_mock: HTTPXMock):
+    """Test that batch_github returns one result per request, in order."""
+    httpx_mock.add_response(
+        url="https://api.github.com/repos/owner/repo/pulls/1",
+        text="diff one",
+        status_code=200,
+    )
+    httpx_mock.add_response(
+        url="https://api.github.com/repos/owner/repo/pulls/2",
+        status_code=404,
+    )
+
+    result = await call_tool(
+        "batch_github",
+        {
+            "requests": [
+                {"tool": "get_pr_diff", "args": {"repo": "owner/repo", "pr_number": 1}},
+                {"tool": "get_pr_diff", "args": {"repo": "owner/repo", "pr_number": 2}},
+            ]
+        },
+    )
+
+    assert len(result) == 2
+    assert result[0].text == "diff one"
+    assert "not found" in result[1].text.lower()
+
+
+@pytest.mark.asyncio
+async def test_batch_github_rejects_non_github_tool():
+    """Test that local tools cannot be run through batch_github."""
+    result = await call_tool(
+        "batch_github",
+        {"requests": [{"tool": "read_file", "args": {"file_path": "README.md"}}]},
+    )
+
+    assert len(result) == 1
+    assert "cannot be batched" in result[0].text
+
+
+@pytest.mark.asyncio
+async def test_batch_github_validates_args(httpx_mock: HTTPXMock):
+    """Test that batched calls are checked against the tool's input schema."""
+    result = await call_tool(
+        "batch_github",
+        {
+            "requests": [
+                {"tool": "get_pr_diff", "args": {"repo": "owner/repo", "pr_number": "../../../../user"}},
+                {"tool": "read_github_files", "args": {"repo": "owner/repo", "file_paths": "abc"}},
+            ]
+        },
+    )
+
+    assert len(result) == 2
+    assert "Invalid arguments" in result[0].text
+    assert "Invalid arguments" in result[1].text
+    assert httpx_mock.get_requests() == []